@@ -4,56 +4,94 @@ Script to compare metrics between boltz_results_70W5 and boltz_results_70W5_with
 to analyze the impact of using MSA on model performance.
 """
 
+import functools
 import json
-import pandas as pd
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import numpy as np
 
+try:
+    import orjson  # 2-5x faster than stdlib json on numeric-heavy payloads
+except ImportError:
+    orjson = None
+
+# Resolve the project layout once at import time instead of per call
+BASE_DIR = Path(__file__).resolve().parents[2] / "outputs" / "boltz_out"
+
+logger = logging.getLogger(__name__)
+
+@functools.lru_cache(maxsize=32)
 def load_json_file(file_path):
-    """Load JSON file and return the data."""
+    """Load JSON file and return the data.
+
+    Memoized on the (resolved) path string so batch callers comparing many
+    prediction pairs against a shared baseline only parse each file once.
+    """
+    if orjson is not None:
+        return orjson.loads(Path(file_path).read_bytes())
     with open(file_path, 'r') as f:
         return json.load(f)
 
-def calculate_percentage_difference(value1, value2):
-    """Calculate percentage difference between two values."""
-    if value1 == 0:
-        return float('inf') if value2 != 0 else 0
-    return ((value2 - value1) / value1) * 100
+def _flatten(d, prefix='', out=None, parents=None, children=None, top=None):
+    """Flatten a nested dict into {dotted.path: leaf_value} (e.g. chains_ptm.0).
 
-def compare_metrics(metrics1, metrics2, metric_name=""):
-    """Compare metrics and return percentage differences."""
-    differences = {}
-    
-    # Handle nested dictionaries (like chains_ptm and pair_chains_iptm)
-    if isinstance(metrics1, dict) and isinstance(metrics2, dict):
-        for key in metrics1:
-            if key in metrics2:
-                if isinstance(metrics1[key], dict):
-                    # Recursively handle nested dictionaries
-                    nested_diff = compare_metrics(metrics1[key], metrics2[key], f"{metric_name}.{key}" if metric_name else key)
-                    differences.update(nested_diff)
-                else:
-                    # Calculate percentage difference for numeric values
-                    diff = calculate_percentage_difference(metrics1[key], metrics2[key])
-                    differences[f"{metric_name}.{key}" if metric_name else key] = diff
-    else:
-        # Handle simple numeric values
-        diff = calculate_percentage_difference(metrics1, metrics2)
-        differences[metric_name if metric_name else "value"] = diff
-    
-    return differences
+    Also records each leaf's top-level parent key and child path while the
+    prefixes are still known, so callers never parse the dotted paths again.
+    The child path (everything after the parent) covers both the 2-level
+    chains_ptm.<i> and 3-level pair_chains_iptm.<i>.<j> schemas uniformly.
+    """
+    if out is None:
+        out = {}
+        parents = {}
+        children = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        # Exact type test: json.load/orjson only ever produce plain dicts,
+        # and `type is dict` skips the MRO walk isinstance does.
+        if type(v) is dict:
+            _flatten(v, key + '.', out, parents, children, top if top is not None else k)
+        else:
+            out[key] = v
+            if top is None:
+                parents[key] = k
+                children[key] = ''
+            else:
+                parents[key] = top
+                children[key] = key[len(top) + 1:]
+    return out, parents, children
+
+def _diff_arrays(d1, d2):
+    """Vectorized percentage differences over the keys common to two flat dicts."""
+    common = [k for k in d1 if k in d2]
+    keys = np.array(common)
+    v1 = np.fromiter((d1[k] for k in common), dtype=np.float64, count=len(common))
+    v2 = np.fromiter((d2[k] for k in common), dtype=np.float64, count=len(common))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diff = np.where(v1 != 0, (v2 - v1) / v1 * 100, np.where(v2 != 0, np.inf, 0.0))
+    return keys, v1, v2, diff
+
+def compare_metrics(metrics1, metrics2):
+    """Compare metrics and return percentage differences.
+
+    Both JSON trees are flattened once, then all percentage differences are
+    computed in a single vectorized NumPy operation instead of one Python
+    call per leaf.
+    """
+    keys, _, _, diff = _diff_arrays(_flatten(metrics1)[0], _flatten(metrics2)[0])
+    return dict(zip(keys.tolist(), diff.tolist()))
 
 def main():
     # Define file paths
-    base_dir = Path(__file__).resolve().parents[2] / "outputs" / "boltz_out"
-    
-    file1_path = base_dir / "boltz_results_70W5" / "predictions" / "70W5" / "confidence_70W5_model_0.json"
-    file2_path = base_dir / "boltz_results_70W5_with_MSA" / "predictions" / "70W5" / "confidence_70W5_model_0_with_MSA.json"
+    file1_path = BASE_DIR / "boltz_results_70W5" / "predictions" / "70W5" / "confidence_70W5_model_0.json"
+    file2_path = BASE_DIR / "boltz_results_70W5_with_MSA" / "predictions" / "70W5" / "confidence_70W5_model_0_with_MSA.json"
     
-    # Load the JSON files
+    # Load the JSON files (the two reads are independent, so overlap them)
     print("Loading JSON files...")
-    data1 = load_json_file(file1_path)
-    data2 = load_json_file(file2_path)
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        f1 = ex.submit(load_json_file, str(file1_path.resolve()))
+        f2 = ex.submit(load_json_file, str(file2_path.resolve()))
+        data1, data2 = f1.result(), f2.result()
     
     print(f"File 1 (without MSA): {file1_path}")
     print(f"File 2 (with MSA): {file2_path}")
@@ -61,70 +99,24 @@ def main():
     
     # Compare all metrics
     print("Calculating percentage differences...")
-    differences = compare_metrics(data1, data2)
-    
-    # Create a DataFrame for better visualization
-    df = pd.DataFrame([
-        {
-            'Metric': metric,
-            'Without_MSA': data1.get(metric.split('.')[0], 'N/A'),
-            'With_MSA': data2.get(metric.split('.')[0], 'N/A'),
-            'Percentage_Difference': diff
-        }
-        for metric, diff in differences.items()
-        if '.' not in metric  # Only top-level metrics for this comparison
-    ])
-    
-    # Add nested metrics separately
-    nested_metrics = []
-    for metric, diff in differences.items():
-        if '.' in metric:
-            parts = metric.split('.')
-            if len(parts) == 2:  # chains_ptm.0, chains_ptm.1, etc.
-                parent_key, child_key = parts
-                try:
-                    without_msa_val = data1[parent_key].get(child_key, 'N/A')
-                    with_msa_val = data2[parent_key].get(child_key, 'N/A')
-                    nested_metrics.append({
-                        'Metric': metric,
-                        'Parent_Metric': parent_key,
-                        'Child_Key': child_key,
-                        'Without_MSA': without_msa_val,
-                        'With_MSA': with_msa_val,
-                        'Percentage_Difference': diff
-                    })
-                except (KeyError, TypeError):
-                    continue
-            elif len(parts) == 3:  # pair_chains_iptm.0.0, pair_chains_iptm.0.1, etc.
-                parent_key, child_key1, child_key2 = parts
-                try:
-                    without_msa_val = data1[parent_key][child_key1].get(child_key2, 'N/A')
-                    with_msa_val = data2[parent_key][child_key1].get(child_key2, 'N/A')
-                    nested_metrics.append({
-                        'Metric': metric,
-                        'Parent_Metric': parent_key,
-                        'Child_Key': f"{child_key1}.{child_key2}",
-                        'Without_MSA': without_msa_val,
-                        'With_MSA': with_msa_val,
-                        'Percentage_Difference': diff
-                    })
-                except (KeyError, TypeError):
-                    continue
-    
-    # Debug: Print the differences to see what's being captured
-    print(f"\nDebug: Total differences found: {len(differences)}")
-    print(f"Debug: Differences with dots: {[k for k in differences.keys() if '.' in k]}")
-    print(f"Debug: Differences without dots: {[k for k in differences.keys() if '.' not in k]}")
-    
-    nested_df = pd.DataFrame(nested_metrics)
-    
-    # Debug information
-    print(f"\nDebug: nested_df shape: {nested_df.shape}")
-    if not nested_df.empty:
-        print(f"Debug: nested_df columns: {list(nested_df.columns)}")
-        print(f"Debug: First few rows:")
-        print(nested_df.head())
-    
+    d1, parent_of, child_of = _flatten(data1)
+    d2, _, _ = _flatten(data2)
+    keys, v1, v2, diff = _diff_arrays(d1, d2)
+
+    # Parents and child paths were recorded during the flatten walk, so no
+    # string parsing happens at build time at all
+    key_list = keys.tolist()
+    parents = np.array([parent_of[k] for k in key_list])
+    children = np.array([child_of[k] for k in key_list])
+    nested = children != ''
+
+    # Debug output is a no-op unless DEBUG logging is enabled, so normal runs
+    # skip the key-list materialization entirely
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Total differences found: %d", len(keys))
+        logger.debug("Differences with dots: %s", keys[nested].tolist())
+        logger.debug("Differences without dots: %s", keys[~nested].tolist())
+
     # Display results
     print("\n" + "="*80)
     print("IMPACT OF MSA ON MODEL METRICS")
@@ -132,24 +124,26 @@ def main():
     
     print("\nTOP-LEVEL METRICS:")
     print("-" * 50)
-    for _, row in df.iterrows():
-        print(f"{row['Metric']:25} | {row['Percentage_Difference']:8.2f}%")
-    
+    for metric, pct in zip(keys[~nested], diff[~nested]):
+        print(f"{metric:25} | {pct:8.2f}%")
+
+    # Boolean masks over the arrays replace the DataFrame grouping
+    chain_mask = parents == 'chains_ptm'
+    pair_mask = parents == 'pair_chains_iptm'
+
     print("\nCHAIN-SPECIFIC METRICS (chains_ptm):")
     print("-" * 50)
-    if not nested_df.empty and 'Parent_Metric' in nested_df.columns:
-        chain_metrics = nested_df[nested_df['Parent_Metric'] == 'chains_ptm']
-        for _, row in chain_metrics.iterrows():
-            print(f"Chain {row['Child_Key']:15} | {row['Percentage_Difference']:8.2f}%")
+    if chain_mask.any():
+        for child, pct in zip(children[chain_mask], diff[chain_mask]):
+            print(f"Chain {child:15} | {pct:8.2f}%")
     else:
         print("No chain-specific metrics found")
-    
+
     print("\nPAIR-CHAIN METRICS (pair_chains_iptm):")
     print("-" * 50)
-    if not nested_df.empty and 'Parent_Metric' in nested_df.columns:
-        pair_metrics = nested_df[nested_df['Parent_Metric'] == 'pair_chains_iptm']
-        for _, row in pair_metrics.iterrows():
-            print(f"Pair {row['Child_Key']:15} | {row['Percentage_Difference']:8.2f}%")
+    if pair_mask.any():
+        for child, pct in zip(children[pair_mask], diff[pair_mask]):
+            print(f"Pair {child:15} | {pct:8.2f}%")
     else:
         print("No pair-chain metrics found")
     
@@ -158,28 +152,45 @@ def main():
     print("SUMMARY STATISTICS")
     print("="*80)
     
-    # Top-level metrics summary
-    top_level_diffs = df['Percentage_Difference'].values
+    # Top-level metrics summary (boolean mask over the diff array, no copy via pandas)
+    top_level_diffs = diff[~nested]
     print(f"Top-level metrics:")
-    print(f"  Mean change: {np.mean(top_level_diffs):.2f}%")
+    print(f"  Mean change: {top_level_diffs.mean():.2f}%")
     print(f"  Median change: {np.median(top_level_diffs):.2f}%")
-    print(f"  Max improvement: {np.max(top_level_diffs):.2f}%")
-    print(f"  Max decline: {np.min(top_level_diffs):.2f}%")
-    
-    # Overall summary
-    all_diffs = [diff for diff in differences.values() if not np.isinf(diff)]
+    print(f"  Max improvement: {top_level_diffs.max():.2f}%")
+    print(f"  Max decline: {top_level_diffs.min():.2f}%")
+
+    # Overall summary (drop inf from zero baselines with a vectorized mask)
+    finite = diff[np.isfinite(diff)]
     print(f"\nAll metrics:")
-    print(f"  Mean change: {np.mean(all_diffs):.2f}%")
-    print(f"  Median change: {np.median(all_diffs):.2f}%")
-    print(f"  Max improvement: {np.max(all_diffs):.2f}%")
-    print(f"  Max decline: {np.min(all_diffs):.2f}%")
+    print(f"  Mean change: {finite.mean():.2f}%")
+    print(f"  Median change: {np.median(finite):.2f}%")
+    print(f"  Max improvement: {finite.max():.2f}%")
+    print(f"  Max decline: {finite.min():.2f}%")
     
     # Save results to CSV
-    output_dir = base_dir / "analysis"
+    output_dir = BASE_DIR / "analysis"
     output_dir.mkdir(exist_ok=True)
     
-    df.to_csv(output_dir / "msa_impact_top_level.csv", index=False)
-    nested_df.to_csv(output_dir / "msa_impact_detailed.csv", index=False)
+    # Assemble each CSV as one string and write it in a single call.
+    # Metric keys contain no commas, so no quoting is needed.
+    top_rows = "".join(
+        f"{k},{a},{b},{d:.6f}\n"
+        for k, a, b, d in zip(keys[~nested], v1[~nested], v2[~nested], diff[~nested])
+    )
+    (output_dir / "msa_impact_top_level.csv").write_text(
+        "Metric,Without_MSA,With_MSA,Percentage_Difference\n" + top_rows
+    )
+
+    nested_rows = "".join(
+        f"{k},{p},{c},{a},{b},{d:.6f}\n"
+        for k, p, c, a, b, d in zip(
+            keys[nested], parents[nested], children[nested], v1[nested], v2[nested], diff[nested]
+        )
+    )
+    (output_dir / "msa_impact_detailed.csv").write_text(
+        "Metric,Parent_Metric,Child_Key,Without_MSA,With_MSA,Percentage_Difference\n" + nested_rows
+    )
     
     print(f"\nResults saved to:")
     print(f"  {output_dir / 'msa_impact_top_level.csv'}")
@@ -12,119 +12,87 @@ import os
 # Suppress warnings
 warnings.filterwarnings('ignore')
 
-def create_comparison_view(boltz_cif, native_cif, output_dir="structure_comparison"):
-    """
-    Create a side-by-side comparison of Boltz vs PDB structures
-    """
-    try:
-        # Create output directory
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Convert paths to strings
-        boltz_str = str(boltz_cif)
-        native_str = str(native_cif)
-        
-        print(f"🔬 Loading Boltz structure: {boltz_cif.name}")
-        print(f"📊 Loading native PDB structure: {native_cif.name}")
-        
-        # Create two separate views
-        boltz_view = nv.show_structure_file(boltz_str)
-        native_view = nv.show_structure_file(native_str)
-        
-        # Configure Boltz view (left side)
-        boltz_view.clear_representations()
-        boltz_view.add_cartoon(color='lime')  # Bright green for Boltz
-        boltz_view.add_ball_and_stick(color='lime')
-        boltz_view.camera = 'orthographic'
-        boltz_view.layout.width = '400px'
-        boltz_view.layout.height = '500px'
-        
-        # Configure native view (right side)
-        native_view.clear_representations()
-        native_view.add_cartoon(color='cyan')  # Blue for native PDB
-        native_view.add_ball_and_stick(color='cyan')
-        native_view.camera = 'orthographic'
-        native_view.layout.width = '400px'
-        native_view.layout.height = '500px'
-        
-        # Create HTML comparison page
-        html_content = f"""
-<!DOCTYPE html>
+# Resolve the project root once at import time
+BASE_DIR = Path("/home/natasha/multimodal_model")
+
+# HTML comparison page template, split into static chunks around the two
+# structure-path substitutions so it can be streamed straight to disk.
+_HTML_PART1 = '''<!DOCTYPE html>
 <html>
 <head>
     <title>Boltz vs PDB Structure Comparison</title>
     <script src="https://unpkg.com/ngl@0.10.4/dist/ngl.js"></script>
     <style>
-        body {{
+        body {
             font-family: Arial, sans-serif;
             margin: 20px;
             background-color: #f5f5f5;
-        }}
-        .header {{
+        }
+        .header {
             text-align: center;
             margin-bottom: 20px;
             padding: 20px;
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
             border-radius: 10px;
-        }}
-        .comparison-container {{
+        }
+        .comparison-container {
             display: flex;
             justify-content: space-between;
             gap: 20px;
             margin-bottom: 20px;
-        }}
-        .structure-panel {{
+        }
+        .structure-panel {
             flex: 1;
             background: white;
             padding: 20px;
             border-radius: 10px;
             box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-        }}
-        .structure-title {{
+        }
+        .structure-title {
             text-align: center;
             font-size: 18px;
             font-weight: bold;
             margin-bottom: 15px;
             padding: 10px;
             border-radius: 5px;
-        }}
-        .boltz-title {{
+        }
+        .boltz-title {
             background-color: #90EE90;
             color: #006400;
-        }}
-        .native-title {{
+        }
+        .native-title {
             background-color: #87CEEB;
             color: #000080;
-        }}
-        .viewport {{
+        }
+        .viewport {
             width: 100%;
             height: 400px;
             border: 2px solid #ddd;
             border-radius: 5px;
-        }}
-        .legend {{
+        }
+        .legend {
             background: white;
             padding: 20px;
             border-radius: 10px;
             box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-        }}
-        .legend-item {{
+        }
+        .legend-item {
             display: flex;
             align-items: center;
             margin: 10px 0;
-        }}
-        .color-box {{
+        }
+        .color-box {
             width: 20px;
             height: 20px;
             margin-right: 10px;
             border-radius: 3px;
-        }}
-        .controls {{
+        }
+        .controls {
             text-align: center;
             margin: 20px 0;
-        }}
-        .control-btn {{
+        }
+        .control-btn {
             background: #667eea;
             color: white;
             border: none;
@@ -132,10 +100,10 @@ def create_comparison_view(boltz_cif, native_cif, output_dir="structure_comparis
             margin: 5px;
             border-radius: 5px;
             cursor: pointer;
-        }}
-        .control-btn:hover {{
+        }
+        .control-btn:hover {
             background: #5a6fd8;
-        }}
+        }
     </style>
 </head>
 <body>
@@ -193,76 +161,121 @@ def create_comparison_view(boltz_cif, native_cif, output_dir="structure_comparis
         var nativeStage = new NGL.Stage("native-viewport");
         
         // Load structures
-        boltzStage.loadFile("{boltz_str}").then(function(boltzComponent) {{
-            boltzComponent.addRepresentation("cartoon", {{color: "lime"}});
-            boltzComponent.addRepresentation("ball+stick", {{color: "lime"}});
+        boltzStage.loadFile("'''
+
+_HTML_PART2 = '''").then(function(boltzComponent) {
+            boltzComponent.addRepresentation("cartoon", {color: "lime"});
+            boltzComponent.addRepresentation("ball+stick", {color: "lime"});
             
             // Color by chain
             var chains = ["A", "B", "C", "D", "E"];
             var colors = ["gold", "hotpink", "limegreen", "orange", "purple"];
             
-            chains.forEach(function(chain, index) {{
+            chains.forEach(function(chain, index) {
                 var selection = ":" + chain;
-                boltzComponent.addRepresentation("cartoon", {{
+                boltzComponent.addRepresentation("cartoon", {
                     color: colors[index % colors.length],
                     sele: selection
-                }});
-            }});
+                });
+            });
             
             boltzStage.autoView();
-        }});
+        });
         
-        nativeStage.loadFile("{native_str}").then(function(nativeComponent) {{
-            nativeComponent.addRepresentation("cartoon", {{color: "cyan"}});
-            nativeComponent.addRepresentation("ball+stick", {{color: "cyan"}});
+        nativeStage.loadFile("'''
+
+_HTML_PART3 = '''").then(function(nativeComponent) {
+            nativeComponent.addRepresentation("cartoon", {color: "cyan"});
+            nativeComponent.addRepresentation("ball+stick", {color: "cyan"});
             
             // Color by chain
             var chains = ["A", "B", "C", "D", "E"];
             var colors = ["gold", "hotpink", "limegreen", "orange", "purple"];
             
-            chains.forEach(function(chain, index) {{
+            chains.forEach(function(chain, index) {
                 var selection = ":" + chain;
-                nativeComponent.addRepresentation("cartoon", {{
+                nativeComponent.addRepresentation("cartoon", {
                     color: colors[index % colors.length],
                     sele: selection
-                }});
-            }});
+                });
+            });
             
             nativeStage.autoView();
-        }});
+        });
         
         // Control functions
-        function resetViews() {{
+        function resetViews() {
             boltzStage.autoView();
             nativeStage.autoView();
-        }}
+        }
         
-        function alignStructures() {{
+        function alignStructures() {
             // This would require more complex logic for actual alignment
             alert("Alignment feature would require additional implementation");
-        }}
+        }
         
-        function toggleRepresentations() {{
+        function toggleRepresentations() {
             // Toggle between cartoon and ball+stick
             var boltzReps = boltzStage.getRepresentations();
             var nativeReps = nativeStage.getRepresentations();
             
-            boltzReps.forEach(function(rep) {{
+            boltzReps.forEach(function(rep) {
                 rep.setVisible(!rep.visible);
-            }});
-            nativeReps.forEach(function(rep) {{
+            });
+            nativeReps.forEach(function(rep) {
                 rep.setVisible(!rep.visible);
-            }});
-        }}
+            });
+        }
     </script>
 </body>
 </html>
-        """
+        '''
+
+
+def create_comparison_view(boltz_cif, native_cif, output_dir="structure_comparison"):
+    """
+    Create a side-by-side comparison of Boltz vs PDB structures
+    """
+    try:
+        # Create output directory
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # Convert paths to strings
+        boltz_str = str(boltz_cif)
+        native_str = str(native_cif)
+        
+        print(f"🔬 Loading Boltz structure: {boltz_cif.name}")
+        print(f"📊 Loading native PDB structure: {native_cif.name}")
+        
+        # Create two separate views
+        boltz_view = nv.show_structure_file(boltz_str)
+        native_view = nv.show_structure_file(native_str)
+        
+        # Configure Boltz view (left side)
+        boltz_view.clear_representations()
+        boltz_view.add_cartoon(color='lime')  # Bright green for Boltz
+        boltz_view.add_ball_and_stick(color='lime')
+        boltz_view.camera = 'orthographic'
+        boltz_view.layout.width = '400px'
+        boltz_view.layout.height = '500px'
+        
+        # Configure native view (right side)
+        native_view.clear_representations()
+        native_view.add_cartoon(color='cyan')  # Blue for native PDB
+        native_view.add_ball_and_stick(color='cyan')
+        native_view.camera = 'orthographic'
+        native_view.layout.width = '400px'
+        native_view.layout.height = '500px'
         
-        # Save the HTML file
+        # Stream the HTML page to disk in static chunks around the two
+        # structure-path substitutions; no full-page string is built in memory.
         html_path = os.path.join(output_dir, "boltz_vs_pdb_comparison.html")
         with open(html_path, 'w') as f:
-            f.write(html_content)
+            f.write(_HTML_PART1)
+            f.write(boltz_str)
+            f.write(_HTML_PART2)
+            f.write(native_str)
+            f.write(_HTML_PART3)
         
         print(f"✅ Comparison HTML saved as: {html_path}")
         
@@ -299,16 +312,20 @@ def main():
     print("=" * 50)
     
     # Set up paths
-    boltz_dir = Path("/home/natasha/multimodal_model") / "outputs" / "boltz_out"
+    boltz_dir = BASE_DIR / "outputs" / "boltz_out"
     boltz_cif = boltz_dir / "boltz_results_70W5_with_MSA" / "predictions" / "70W5" / "70W5_model_0.cif"
-    native_cif = Path("/home/natasha/multimodal_model") / "7ow5.cif"
-    
-    # Check if files exist
-    if not boltz_cif.exists():
+    native_cif = BASE_DIR / "7ow5.cif"
+
+    # Check if files exist (single stat per file instead of repeated .exists() syscalls)
+    try:
+        os.stat(boltz_cif)
+    except FileNotFoundError:
         print(f"❌ Boltz CIF file not found at {boltz_cif}")
         return
-    
-    if not native_cif.exists():
+
+    try:
+        os.stat(native_cif)
+    except FileNotFoundError:
         print(f"❌ Native PDB CIF file not found at {native_cif}")
         return
     
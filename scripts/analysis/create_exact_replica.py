@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Recreate the EXACT replica PyMOL render (native 7OW5 vs Boltz prediction)
+Generates the .pml script and drives headless PyMOL to produce the aligned
+PNGs and session file under exact_replica/
+"""
+
+import json
+import os
+import subprocess
+from pathlib import Path
+
+BASE_DIR = Path("/home/natasha/multimodal_model")
+NATIVE_CIF = BASE_DIR / "7ow5.cif"
+TEST_CIF = BASE_DIR / "outputs" / "boltz_out" / "boltz_results_70W5_with_MSA" / "predictions" / "70W5" / "70W5_model_0.cif"
+OUTPUT_DIR = Path(__file__).resolve().parent / "exact_replica"
+
+# Script template compiled once at import time; build_pymol_script only fills
+# in the three path placeholders (plus the alignment block), so sweeps over
+# many PDBs never re-assemble the static parts
+_PML_TEMPLATE = """
+# EXACT replica of the working PyMOL script from the notebook
+# This should give you the same alignment and appearance
+
+# ————— Load Structures (EXACT order from working script) —————
+load {native}, native
+load {test}, test
+
+# ————— Align test → native —————
+# This superimposes "test" onto "native" so they overlap
+{align}
+
+# ————— Representations (EXACT from working script) —————
+hide everything, all
+show cartoon, all
+
+# ————— Color by Chain (EXACT colors from working script) —————
+# One python block with direct cmd.color calls instead of 10 individual
+# color statements through PyMOL's selector parser
+python
+pairs_n = {{"A": "forest", "B": "cyan", "C": "blue", "D": "green", "E": "purple"}}
+pairs_t = {{"A": "lime", "B": "yellow", "C": "grey", "D": "orange", "E": "pink"}}
+for c, col in pairs_n.items():
+    cmd.color(col, f"native and chain {{c}}")
+for c, col in pairs_t.items():
+    cmd.color(col, f"test and chain {{c}}")
+python end
+
+# ————— Frame & Render (EXACT from working script) —————
+zoom all
+orient all
+
+# ————— Force White Background —————
+# Set background to white (multiple commands to ensure it works)
+bg_color white
+set bg_rgb, [1.0, 1.0, 1.0]
+
+# Quality settings apply to the single high-res trace only; the preview is
+# a Python-side downscale of it, so it never pays for outline mode or AA
+set ray_trace_mode, 1
+set ray_shadows, 0
+set antialias, 2
+
+# Single ray trace: only the high-res render; the 800x600 preview is
+# produced by downscaling in Python afterwards
+png {png}, width=1600, height=1200, ray=1, dpi=300
+
+# Save session file
+save {out}/exact_replica_session.pse
+
+# Quit PyMOL
+quit
+"""
+
+
+def _alignment_block(native_cif, test_cif, output_dir):
+    """
+    First run: align (cycles=0 skips the refinement passes) and cache the
+    resulting 4x4 matrix. Later runs: apply the cached matrix directly,
+    which is constant-time instead of a full Kabsch pass over all atoms.
+
+    The cache is keyed on the input paths and only trusted while it is
+    newer than both CIFs, so swapping in a different prediction (or
+    regenerating one) re-aligns instead of applying a stale matrix.
+    """
+    matrix_path = output_dir / "align_matrix.json"
+    inputs = [os.fspath(native_cif), os.fspath(test_cif)]
+    try:
+        cached = json.loads(matrix_path.read_text())
+        if (isinstance(cached, dict) and cached.get("inputs") == inputs
+                and os.stat(matrix_path).st_mtime >= max(os.stat(p).st_mtime for p in inputs)):
+            return f"transform_object test, {cached['matrix']}"
+    except (OSError, ValueError):
+        pass
+    return f"""align test, native, cycles=0
+
+# Cache the alignment matrix so future runs can transform_object instead
+python
+import json
+open(r"{matrix_path}", "w").write(json.dumps({{"inputs": {json.dumps(inputs)}, "matrix": list(cmd.get_object_matrix("test"))}}))
+python end"""
+
+
+def build_pymol_script(native_cif, test_cif, output_dir, png_path=None):
+    """
+    Build the PyMOL script (same commands as the working notebook script)
+
+    png_path overrides where the high-res render is written (e.g. a named
+    pipe); it defaults to exact_replica_highres.png in the output dir.
+    """
+    # os.fspath converts each Path exactly once instead of per placeholder
+    out = os.fspath(output_dir)
+    return _PML_TEMPLATE.format_map({
+        "native": os.fspath(native_cif),
+        "test": os.fspath(test_cif),
+        "out": out,
+        "png": os.fspath(png_path) if png_path is not None else f"{out}/exact_replica_highres.png",
+        "align": _alignment_block(native_cif, test_cif, output_dir),
+    })
+
+
+def _outputs_fresh(native_cif, test_cif, output_dir):
+    """
+    True when all render outputs exist and are newer than both input CIFs
+    and this script, make-style: a ~30s ray trace becomes a few stat calls.
+    """
+    try:
+        needed = max(os.stat(native_cif).st_mtime,
+                     os.stat(test_cif).st_mtime,
+                     os.stat(__file__).st_mtime)
+        return all(
+            os.stat(output_dir / name).st_mtime >= needed
+            for name in ("exact_replica_highres.png",
+                         "exact_replica_aligned.png",
+                         "exact_replica_session.pse")
+        )
+    except OSError:
+        return False
+
+
+def _run_streaming(pymol_script, output_dir):
+    """
+    Run PyMOL with the high-res PNG routed through a named pipe, so the
+    render bytes never round-trip through disk before the downscale.
+    """
+    import io
+    import tempfile
+    import time
+    from PIL import Image
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fifo = os.path.join(tmp, "highres.png")
+        os.mkfifo(fifo)
+        # The script was already built against the default png path; retarget
+        # the render at the pipe and feed the script over stdin
+        script = pymol_script.replace(
+            f"png {output_dir}/exact_replica_highres.png", f"png {fifo}")
+        proc = subprocess.Popen(["pymol", "-cqp"], stdin=subprocess.PIPE, text=True)
+        proc.stdin.write(script)
+        proc.stdin.close()
+        # Non-blocking read end: a blocking open would hang forever if PyMOL
+        # dies (bad CIF, load error) before it ever opens the write end, so
+        # poll child liveness while draining the pipe instead
+        fd = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+        chunks = []
+        try:
+            while True:
+                try:
+                    chunk = os.read(fd, 1 << 20)
+                except BlockingIOError:
+                    chunk = None
+                if chunk:
+                    chunks.append(chunk)
+                    continue
+                if chunk == b"" and chunks:
+                    break  # writer closed after producing the render
+                if proc.poll() is not None:
+                    break  # PyMOL exited without (fully) writing
+                time.sleep(0.05)
+        finally:
+            os.close(fd)
+        data = b"".join(chunks)
+        if proc.wait() != 0 or not data:
+            raise subprocess.CalledProcessError(proc.returncode or 1, "pymol")
+
+    # Persist the high-res render with one sequential write and build the
+    # preview straight from the in-memory bytes
+    (output_dir / "exact_replica_highres.png").write_bytes(data)
+    with Image.open(io.BytesIO(data)) as im:
+        im.thumbnail((800, 600), Image.LANCZOS)
+        im.save(output_dir / "exact_replica_aligned.png", optimize=True)
+
+
+def create_exact_replica(native_cif=NATIVE_CIF, test_cif=TEST_CIF,
+                         output_dir=OUTPUT_DIR, save_script=True,
+                         stream_png=False):
+    """
+    Generate the PyMOL script and run it headless
+
+    With stream_png=True the render is consumed through an os.mkfifo pipe
+    (useful in batch sweeps where the PNG goes straight to analysis).
+    """
+    try:
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        # Incremental: skip the ray trace when outputs are already current
+        if _outputs_fresh(native_cif, test_cif, output_dir):
+            print(f"✅ Renders already up to date under: {output_dir}")
+            return True
+
+        pymol_script = build_pymol_script(native_cif, test_cif, output_dir)
+
+        if stream_png:
+            _run_streaming(pymol_script, output_dir)
+            print(f"✅ Renders saved under: {output_dir}")
+            return True
+
+        if save_script:
+            script_path = output_dir / "exact_replica_script.pml"
+            script_path.write_text(pymol_script)
+            print(f"✅ PyMOL script saved as: {script_path}")
+            # No shell fork: exec pymol directly; -cq = headless + no splash
+            subprocess.run(["pymol", "-cq", str(script_path)], check=True)
+        else:
+            # Feed the script over stdin so no .pml ever touches disk
+            subprocess.run(["pymol", "-cqp"], input=pymol_script,
+                           text=True, check=True)
+
+        # Downscale the single ray-traced render instead of paying a second
+        # full ray pass for the 800x600 preview
+        from PIL import Image
+        with Image.open(output_dir / "exact_replica_highres.png") as im:
+            im.thumbnail((800, 600), Image.LANCZOS)
+            im.save(output_dir / "exact_replica_aligned.png", optimize=True)
+
+        print(f"✅ Renders saved under: {output_dir}")
+        return True
+
+    except subprocess.CalledProcessError as e:
+        print(f"❌ PyMOL run failed (rc={e.returncode})")
+        return False
+    except Exception as e:
+        print(f"❌ Error creating exact replica: {e}")
+        return False
+
+
+def main():
+    """Main function"""
+    print("🔬 Exact Replica PyMOL Render")
+    print("=" * 50)
+    print(f"Native structure: {NATIVE_CIF}")
+    print(f"Boltz structure:  {TEST_CIF}")
+
+    success = create_exact_replica()
+
+    if success:
+        print("\n🎉 Exact replica created successfully!")
+        print("📁 Check the 'exact_replica' folder for the PNGs and session")
+    else:
+        print("\n❌ Failed to create exact replica. Check the error messages above.")
+
+
+if __name__ == "__main__":
+    main()
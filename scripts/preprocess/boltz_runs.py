@@ -13,13 +13,28 @@ from __future__ import annotations
 
 import os
 import sys
+import json
 import time
 import shlex
 import shutil
 import argparse
+import tempfile
 import subprocess
+import multiprocessing as mp
+import io
+import traceback
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Optional
+
+try:
+    # Import once at module load: every in-process predict call then reuses
+    # the warm torch/boltz imports and CUDA context instead of paying
+    # interpreter startup + module import + context init per invocation.
+    from boltz.main import cli as _boltz_cli
+except ImportError:
+    _boltz_cli = None
 
 
 BASE_DIR_DEFAULT = Path("/home/natasha/multimodal_model")
@@ -70,8 +85,12 @@ def list_chunk_dirs(chunks_root: Path) -> List[Path]:
 
 
 def list_yamls(dir_path: Path) -> List[Path]:
+    # One directory pass instead of two glob patterns
     d = Path(dir_path)
-    return sorted(list(d.glob("*.yml")) + list(d.glob("*.yaml")))
+    try:
+        return sorted(p for p in d.iterdir() if p.suffix in (".yml", ".yaml"))
+    except FileNotFoundError:
+        return []
 
 
 def yaml_to_pair_dirname(yaml_path: Path) -> str:
@@ -83,23 +102,107 @@ def embeddings_exist_for_yaml(yaml_path: Path, outdir: Path) -> bool:
     Robust skip check:
     Accept ANY embeddings*.npz inside:
       outdir/boltz_results_*/predictions/<pair>/embeddings*.npz
+    (os.path/os.listdir throughout - glob compiled a pattern and allocated a
+    Path per hit, several times the cost per check.)
     """
     pair = yaml_to_pair_dirname(yaml_path)
-    patterns = [
-        f"boltz_results_*/predictions/{pair}/embeddings*.npz",
-        f"predictions/{pair}/embeddings*.npz",  # legacy fallback
-    ]
-    for pat in patterns:
-        if any(outdir.glob(pat)):
+    out = os.fspath(outdir)
+    candidates = [os.path.join(out, "predictions", pair)]  # legacy fallback
+    try:
+        for name in os.listdir(out):
+            if name.startswith("boltz_results_"):
+                candidates.append(os.path.join(out, name, "predictions", pair))
+    except FileNotFoundError:
+        return False
+
+    for pair_dir in candidates:
+        try:
+            names = os.listdir(pair_dir)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        if any(n.startswith("embeddings") and n.endswith(".npz") for n in names):
             return True
     return False
 
 
-def all_embeddings_exist_for_dir(input_dir: Path, outdir: Path) -> bool:
-    yamls = list_yamls(input_dir)
+def _scan_completed_pairs(outdir: Path) -> set:
+    """
+    One scandir pass over outdir's predictions subtrees (both the
+    boltz_results_* layout and the legacy flat one) collecting the names of
+    pair dirs that already hold an embeddings*.npz. Turns the per-YAML glob
+    in resume checks into an O(1) set membership test.
+    """
+    completed: set = set()
+    roots = []
+    try:
+        with os.scandir(outdir) as it:
+            for entry in it:
+                if entry.is_dir():
+                    if entry.name.startswith("boltz_results_"):
+                        roots.append(os.path.join(entry.path, "predictions"))
+                    elif entry.name == "predictions":  # legacy fallback
+                        roots.append(entry.path)
+    except FileNotFoundError:
+        return completed
+
+    for root in roots:
+        try:
+            pairs = os.scandir(root)
+        except FileNotFoundError:
+            continue
+        with pairs:
+            for pair in pairs:
+                if not pair.is_dir() or pair.name in completed:
+                    continue
+                try:
+                    with os.scandir(pair.path) as files:
+                        if any(f.name.startswith("embeddings") and f.name.endswith(".npz") for f in files):
+                            completed.add(pair.name)
+                except FileNotFoundError:
+                    pass
+    return completed
+
+
+def all_embeddings_exist_for_yamls(yamls: List[Path], completed: set) -> bool:
     if not yamls:
         return False
-    return all(embeddings_exist_for_yaml(y, outdir) for y in yamls)
+    return all(y.stem in completed for y in yamls)
+
+
+def _chunk_weight(chunk_dir: Path) -> int:
+    """Total YAML bytes in a chunk, a cheap proxy for its compute cost."""
+    return sum(p.stat().st_size for p in list_yamls(chunk_dir))
+
+
+def _load_progress(out_root: Path) -> dict:
+    p = Path(out_root) / ".checkpoints" / "progress.json"
+    try:
+        return json.loads(p.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _update_progress(out_root: Path, chunk_name: str, status: str, lock=None) -> None:
+    """Merge one chunk's status into progress.json atomically (tmp+rename)."""
+    ckpt_dir = Path(out_root) / ".checkpoints"
+    ckpt_dir.mkdir(parents=True, exist_ok=True)
+    if lock is not None:
+        lock.acquire()
+    try:
+        progress = _load_progress(out_root)
+        entry = progress.setdefault(chunk_name, {})
+        entry["status"] = status
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        if status == "running":
+            entry["started_at"] = now
+        else:
+            entry["finished_at"] = now
+        tmp = ckpt_dir / "progress.json.tmp"
+        tmp.write_text(json.dumps(progress, indent=2, sort_keys=True))
+        os.replace(tmp, ckpt_dir / "progress.json")
+    finally:
+        if lock is not None:
+            lock.release()
 
 
 def mark_done(outdir: Path) -> None:
@@ -160,6 +263,38 @@ def build_boltz_args(
     return args
 
 
+def _run_inprocess(cmd: List[str], outdir: Path, input_path: Path, quiet: bool = True) -> int:
+    """
+    Invoke the boltz click CLI as a function in this process, translating
+    exceptions/exit codes into the same rc contract as the subprocess path.
+    When quiet, output goes to a buffer and is only persisted on failure;
+    --debug streams it to the console like the subprocess path.
+    """
+    buf = io.StringIO()
+    rc = 0
+    try:
+        if quiet:
+            with contextlib.redirect_stdout(buf), contextlib.redirect_stderr(buf):
+                _boltz_cli.main(args=cmd[1:], standalone_mode=False)
+        else:
+            print("\nCMD:", " ".join(map(shlex.quote, cmd)))
+            _boltz_cli.main(args=cmd[1:], standalone_mode=False)
+    except SystemExit as e:
+        # click may exit with a message string; treat any non-int code as
+        # failure instead of letting int() blow up the runner loop
+        if e.code is None or isinstance(e.code, int):
+            rc = e.code or 0
+        else:
+            rc = 1
+            buf.write(f"\nSystemExit: {e.code}")
+    except Exception:
+        rc = 1
+        buf.write("\n" + traceback.format_exc())
+    if rc != 0:
+        append_failure_log(outdir, cmd, input_path, buf.getvalue())
+    return rc
+
+
 def run_cli(
     input_path: Path,
     outdir: Path,
@@ -167,6 +302,8 @@ def run_cli(
     base_dir: Path,
     *,
     quiet: bool = True,
+    env: Optional[dict] = None,
+    isolated: bool = False,
 ) -> int:
     input_path = input_path.resolve()
     outdir = outdir.resolve()
@@ -174,9 +311,21 @@ def run_cli(
 
     cmd = build_boltz_args(input_path, outdir, **boltz_cfg)
 
+    # In-process by default when boltz is importable; --isolated keeps the
+    # subprocess barrier (survives segfaults/OOM kills at the cost of
+    # re-paying startup per call).
+    if not isolated and _boltz_cli is not None:
+        return _run_inprocess(cmd, outdir, input_path, quiet=quiet)
+    # env=None inherits the parent environment without a Python-side dict
+    # copy per launch; the GPU workers pass their CUDA-pinned copy instead.
+    # close_fds keeps parent fds (conda/Jupyter leave many open) out of the
+    # child. The child stays in our process group on purpose: Ctrl+C must
+    # reach boltz too, or an interrupted run leaves an orphan on the GPU.
+    spawn_kwargs = dict(cwd=str(base_dir), env=env, close_fds=True)
+
     if not quiet:
         print("\nCMD:", " ".join(map(shlex.quote, cmd)))
-        proc = subprocess.run(cmd, cwd=str(base_dir), env=os.environ.copy())
+        proc = subprocess.run(cmd, **spawn_kwargs)
         return proc.returncode
 
     # Quiet path: run with /dev/null to avoid buffering.
@@ -184,8 +333,7 @@ def run_cli(
         cmd,
         stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL,
-        cwd=str(base_dir),
-        env=os.environ.copy(),
+        **spawn_kwargs,
     )
     if proc.returncode == 0:
         return 0
@@ -196,8 +344,7 @@ def run_cli(
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
         text=True,
-        cwd=str(base_dir),
-        env=os.environ.copy(),
+        **spawn_kwargs,
     )
     append_failure_log(outdir, cmd, input_path, proc2.stdout or "")
     return proc2.returncode
@@ -212,47 +359,70 @@ def run_dir_with_safe_resume(
     *,
     progress_every: int,
     quiet: bool,
+    env: Optional[dict] = None,
+    isolated: bool = False,
+    completed: Optional[set] = None,
 ) -> None:
     input_dir = Path(input_dir)
     outdir = Path(outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
+    # Single directory scan (unless the caller pre-scanned in parallel) and
+    # single YAML listing up front; every resume check below is a set test
+    if completed is None:
+        completed = _scan_completed_pairs(outdir)
+    yamls = list_yamls(input_dir)
+
     if (outdir / DONE_MARKER).exists():
-        # Re-scan in case new YAMLs were added after completion
-        if all_embeddings_exist_for_dir(input_dir, outdir):
+        # Re-check in case new YAMLs were added after completion
+        if all_embeddings_exist_for_yamls(yamls, completed):
             print(f"[SKIP] {label}: {DONE_MARKER} exists and embeddings complete -> {outdir}")
             return
         else:
             print(f"[RESUME] {label}: {DONE_MARKER} exists but new/missing YAMLs detected -> {outdir}")
             # continue into loop
 
-    yamls = list_yamls(input_dir)
     if not yamls:
         print(f"[WARN] {label}: no YAMLs found in {input_dir}")
         append_fail(outdir, input_dir, 998, note="No YAML files found in directory")
         return
 
-    if all_embeddings_exist_for_dir(input_dir, outdir):
+    if all(y.stem in completed for y in yamls):
         print(f"[SKIP] {label}: embeddings already complete -> {outdir}")
         mark_done(outdir)
         return
 
-    print(f"\n=== {label} (per-YAML resume) ===")
+    print(f"\n=== {label} (batched + per-YAML resume) ===")
     n_total = len(yamls)
-    n_done = 0
+    missing = [y for y in yamls if y.stem not in completed]
+    n_done = n_total - len(missing)
+
+    # Batched pass: stage every missing YAML into one temp dir (symlinks) and
+    # invoke boltz once on the directory, so model load / CUDA init is paid
+    # once instead of per YAML. The per-YAML loop below only retries the
+    # YAMLs still missing afterwards (true failures).
+    if len(missing) > 1:
+        print(f"[BATCH] {label}: {len(missing)}/{n_total} missing -> one directory-level boltz run")
+        with tempfile.TemporaryDirectory(prefix="boltz_batch_") as tmp:
+            for y in missing:
+                os.symlink(y.resolve(), os.path.join(tmp, y.name))
+            rc = run_cli(Path(tmp), outdir, boltz_cfg, base_dir, quiet=quiet, env=env, isolated=isolated)
+        if rc != 0:
+            append_fail(outdir, input_dir, rc, note=f"batched run over {len(missing)} yamls")
+        completed = _scan_completed_pairs(outdir)
+        still_missing = [y for y in missing if y.stem not in completed]
+        n_done += len(missing) - len(still_missing)
+        missing = still_missing
+
     n_run = 0
     n_fail = 0
 
-    for i, y in enumerate(yamls, start=1):
-        if embeddings_exist_for_yaml(y, outdir):
-            n_done += 1
-            continue
-
+    for i, y in enumerate(missing, start=1):
         n_run += 1
         if (n_run == 1) or (n_run % progress_every == 0):
-            print(f"[PROGRESS] {label}: scanned={i}/{n_total} done={n_done} run={n_run} fail={n_fail}")
+            print(f"[PROGRESS] {label}: retry={i}/{len(missing)} done={n_done} run={n_run} fail={n_fail}")
 
-        rc = run_cli(y, outdir, boltz_cfg, base_dir, quiet=quiet)
+        rc = run_cli(y, outdir, boltz_cfg, base_dir, quiet=quiet, env=env, isolated=isolated)
         if rc != 0:
             n_fail += 1
             append_fail(outdir, y, rc)
@@ -262,17 +432,91 @@ def run_dir_with_safe_resume(
             n_fail += 1
             append_fail(outdir, y, 999, note="rc=0 but embeddings missing")
 
-    if all_embeddings_exist_for_dir(input_dir, outdir):
+    if all_embeddings_exist_for_yamls(yamls, _scan_completed_pairs(outdir)):
         mark_done(outdir)
         print(f"[DONE] {label}: marked {DONE_MARKER}")
     else:
         print(f"[INCOMPLETE] {label}: missing outputs remain; see {outdir}/{FAIL_LOG} and {outdir}/{FAILURES_LOG}")
 
 
-def run_chunked_dataset(chunks_root: Path, out_root: Path, label: str, boltz_cfg: dict, base_dir: Path, *, progress_every: int, quiet: bool) -> None:
-    for chunk_dir in list_chunk_dirs(chunks_root):
-        outdir = Path(out_root) / chunk_dir.name
-        run_dir_with_safe_resume(chunk_dir, outdir, f"{label} {chunk_dir.name}", boltz_cfg, base_dir, progress_every=progress_every, quiet=quiet)
+def _run_one_chunk(chunk_dir: Path, out_root: Path, label: str, boltz_cfg: dict, base_dir: Path, progress_every: int, quiet: bool, env: Optional[dict] = None, lock=None, isolated: bool = False, completed: Optional[set] = None) -> None:
+    outdir = Path(out_root) / chunk_dir.name
+    _update_progress(out_root, chunk_dir.name, "running", lock=lock)
+    run_dir_with_safe_resume(
+        chunk_dir, outdir, label, boltz_cfg, base_dir,
+        progress_every=progress_every, quiet=quiet, env=env,
+        isolated=isolated, completed=completed,
+    )
+    status = "completed" if (outdir / DONE_MARKER).exists() else "incomplete"
+    _update_progress(out_root, chunk_dir.name, status, lock=lock)
+
+
+def _gpu_worker(gpu_id: str, queue: "mp.Queue", lock, out_root: Path, label: str, boltz_cfg: dict, base_dir: Path, progress_every: int, quiet: bool, isolated: bool = False) -> None:
+    """Pull chunk dirs off the shared queue and run each pinned to one GPU."""
+    # Set the pin in our own environ too so the in-process predict path
+    # (no subprocess env) sees the same device restriction
+    os.environ["CUDA_VISIBLE_DEVICES"] = gpu_id
+    env = os.environ.copy()
+    while True:
+        item = queue.get()
+        if item is None:  # sentinel: queue drained
+            return
+        chunk_dir, completed = item
+        _run_one_chunk(
+            chunk_dir, out_root, f"{label} {chunk_dir.name} [gpu{gpu_id}]",
+            boltz_cfg, base_dir, progress_every, quiet, env=env, lock=lock,
+            isolated=isolated, completed=completed,
+        )
+
+
+def run_chunked_dataset(chunks_root: Path, out_root: Path, label: str, boltz_cfg: dict, base_dir: Path, *, progress_every: int, quiet: bool, gpu_ids: Optional[List[str]] = None, isolated: bool = False) -> None:
+    chunk_dirs = list_chunk_dirs(chunks_root)
+
+    # The resume scans are pure I/O (scandir releases the GIL), so fan them
+    # out over threads instead of paying one sequential walk per chunk
+    with ThreadPoolExecutor(max_workers=32) as ex:
+        scans = dict(zip(
+            (c.name for c in chunk_dirs),
+            ex.map(_scan_completed_pairs, (Path(out_root) / c.name for c in chunk_dirs)),
+        ))
+
+    # progress.json is telemetry, not truth: a "completed" chunk is only
+    # skipped after re-verifying every YAML against the scan, so chunks that
+    # grew new YAMLs after completion still get resumed. Then dispatch
+    # largest-first (longest-processing-time heuristic): the biggest chunks
+    # start early so workers don't all idle behind a straggler at the end
+    progress = _load_progress(out_root)
+    skipped = [
+        c for c in chunk_dirs
+        if progress.get(c.name, {}).get("status") == "completed"
+        and all_embeddings_exist_for_yamls(list_yamls(c), scans[c.name])
+    ]
+    if skipped:
+        print(f"[SKIP] {label}: {len(skipped)} chunk(s) already completed per progress.json")
+    chunk_dirs = [c for c in chunk_dirs if c not in skipped]
+    chunk_dirs.sort(key=_chunk_weight, reverse=True)
+
+    if gpu_ids and len(gpu_ids) > 1:
+        # One worker process per GPU pulling chunks greedily off a shared
+        # queue; each run keeps --devices 1 but they execute concurrently.
+        queue: mp.Queue = mp.Queue()
+        lock = mp.Lock()
+        for chunk_dir in chunk_dirs:
+            queue.put((chunk_dir, scans[chunk_dir.name]))
+        for _ in gpu_ids:
+            queue.put(None)
+        workers = [
+            mp.Process(target=_gpu_worker, args=(gpu_id, queue, lock, out_root, label, boltz_cfg, base_dir, progress_every, quiet, isolated))
+            for gpu_id in gpu_ids
+        ]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        return
+
+    for chunk_dir in chunk_dirs:
+        _run_one_chunk(chunk_dir, out_root, f"{label} {chunk_dir.name}", boltz_cfg, base_dir, progress_every, quiet, isolated=isolated, completed=scans[chunk_dir.name])
 
 
 # def run_val_folder(val_yaml_dir: Path, out_root: Path, boltz_cfg: dict, base_dir: Path, *, progress_every: int, quiet: bool) -> None:
@@ -288,6 +532,10 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--no_require_ld_preload", action="store_true")
 
     p.add_argument("--devices", type=int, default=1)
+    p.add_argument("--gpus", type=str, default="",
+                   help="Comma-separated CUDA device ids (e.g. '0,1,2,3'). "
+                        "When more than one is given, chunks are pulled off a shared "
+                        "queue by one worker process per GPU (each still --devices 1).")
     p.add_argument("--accelerator", type=str, default="gpu", choices=["gpu", "cpu", "tpu"])
     p.add_argument("--model", type=str, default="boltz2", choices=["boltz1", "boltz2"])
     p.add_argument("--recycling_steps", type=int, default=3)
@@ -306,6 +554,8 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--skip_val", action="store_true")
     p.add_argument("--skip_test", action="store_true")
 
+    p.add_argument("--isolated", action="store_true", default=False,
+                   help="Always run boltz in a subprocess instead of in-process (robust to segfaults).")
     p.add_argument("--progress_every", type=int, default=1000)
     p.add_argument("--quiet", action="store_true", default=True)
     p.add_argument("--debug", action="store_true", help="If set, run non-quiet (streams boltz output).")
@@ -355,6 +605,7 @@ def main() -> int:
     )
 
     quiet = (not args.debug) and args.quiet
+    gpu_ids = [g.strip() for g in args.gpus.split(",") if g.strip()]
 
     print("\n==============================")
     print("Boltz runner starting")
@@ -369,19 +620,19 @@ def main() -> int:
 
     try:
         if not args.skip_train:
-            run_chunked_dataset(train_chunks_root, out_train, "TRAIN", boltz_cfg, base_dir, progress_every=args.progress_every, quiet=quiet)
+            run_chunked_dataset(train_chunks_root, out_train, "TRAIN", boltz_cfg, base_dir, progress_every=args.progress_every, quiet=quiet, gpu_ids=gpu_ids, isolated=args.isolated)
         else:
             print("[SKIP] TRAIN")
 
         if not args.skip_val:
         #     run_val_folder(yaml_dir_val, out_val, boltz_cfg, base_dir, progress_every=args.progress_every, quiet=quiet)
-            run_chunked_dataset(val_chunks_root, out_val, "VAL", boltz_cfg, base_dir, progress_every=args.progress_every, quiet=quiet)
+            run_chunked_dataset(val_chunks_root, out_val, "VAL", boltz_cfg, base_dir, progress_every=args.progress_every, quiet=quiet, gpu_ids=gpu_ids, isolated=args.isolated)
         else:
             print("[SKIP] VAL")
 
 
         if not args.skip_test:
-            run_chunked_dataset(test_chunks_root, out_test, "TEST", boltz_cfg, base_dir, progress_every=args.progress_every, quiet=quiet)
+            run_chunked_dataset(test_chunks_root, out_test, "TEST", boltz_cfg, base_dir, progress_every=args.progress_every, quiet=quiet, gpu_ids=gpu_ids, isolated=args.isolated)
         else:
             print("[SKIP] TEST")
 
@@ -1,5 +1,4 @@
 import pandas as pd
-import yaml
 from pathlib import Path
 
 # def load_and_concatenate(csv_paths):
@@ -7,35 +6,56 @@ from pathlib import Path
 #     return pd.concat(dataframes, ignore_index=True)
 # think there needs to be one fasta file for each complex
 
+def _yaml_scalar(value):
+    # Plain amino-acid strings need no quoting; anything else (gap '-',
+    # stop '*', stray punctuation) is single-quoted so the emitted YAML
+    # stays valid instead of refusing the row
+    s = str(value)
+    if s.isalnum():
+        return s
+    return "'" + s.replace("'", "''") + "'"
+
+
+def _column_or_x(sub, name):
+    # Missing column or NaN both fall back to the "X" placeholder
+    if name in sub.columns:
+        return sub[name].fillna('X').to_numpy()
+    return ['X'] * len(sub)
+
+
 def convert_to_structural_boltz_yaml(df, output_path):
-    targets = []
-    for idx, row in df.iterrows():
-        peptide = row.get('Peptide')
-        mhc = row.get('HLA_sequence')
-        # Clean HLA sequence by removing line breaks and commas
-        mhc = str(mhc).replace('\n', '').replace(',', '').strip() if pd.notnull(mhc) else "X"
-        tcra = row['TCRa'] if pd.notnull(row.get('TCRa')) else "X"
-        tcrb = row['TCRb'] if pd.notnull(row.get('TCRb')) else "X"
-
-        if pd.notnull(peptide) and pd.notnull(mhc):
-            target = {
-                'name': f"example_{idx}",
-                'sequences': [
-                    {'protein': {'id': 'M', 'sequence': mhc, 'msa': 'empty'}},
-                    {'protein': {'id': 'P', 'sequence': peptide, 'msa': 'empty'}},
-                    {'protein': {'id': 'A', 'sequence': tcra, 'msa': 'empty'}},
-                    {'protein': {'id': 'B', 'sequence': tcrb, 'msa': 'empty'}},
-                ],
-            }
-            targets.append(target)
-
-    yaml_obj = {
-        'version': 1,
-        'targets': targets
-    }
+    # Vectorized column prep: mask the usable rows once, clean the HLA
+    # sequences with pandas string ops, and zip plain NumPy arrays instead of
+    # boxing every cell through df.iterrows
+    mask = df['Peptide'].notna()
+    sub = df.loc[mask]
+    idx = sub.index.to_numpy()
+    pep = sub['Peptide'].to_numpy()
+    # Clean HLA sequence by removing line breaks and commas
+    mhc = (sub['HLA_sequence'].fillna('X')
+           .str.replace('\n', '', regex=False)
+           .str.replace(',', '', regex=False)
+           .str.strip()
+           .to_numpy()) if 'HLA_sequence' in sub.columns else ['X'] * len(sub)
+    tcra = _column_or_x(sub, 'TCRa')
+    tcrb = _column_or_x(sub, 'TCRb')
 
+    # The target schema is fixed (4 proteins, ids M/P/A/B), so emit the YAML
+    # directly with f-strings instead of walking a generic tree through a
+    # YAML emitter; _yaml_scalar quotes the rare sequence that isn't a bare
+    # amino-acid string
     with open(output_path, 'w') as f:
-        yaml.dump(yaml_obj, f, default_flow_style=False, sort_keys=False)
+        f.write("version: 1\ntargets:\n")
+        for i, p, m, a, b in zip(idx, pep, mhc, tcra, tcrb):
+            p, m, a, b = _yaml_scalar(p), _yaml_scalar(m), _yaml_scalar(a), _yaml_scalar(b)
+            f.write(
+                f"- name: example_{i}\n"
+                f"  sequences:\n"
+                f"  - protein: {{id: M, sequence: {m}, msa: empty}}\n"
+                f"  - protein: {{id: P, sequence: {p}, msa: empty}}\n"
+                f"  - protein: {{id: A, sequence: {a}, msa: empty}}\n"
+                f"  - protein: {{id: B, sequence: {b}, msa: empty}}\n"
+            )
     print(f"Saved structural Boltz YAML to: {output_path}")
 
 
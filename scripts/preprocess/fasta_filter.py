@@ -6,68 +6,81 @@ df2 = pd.read_csv('data/raw/vdjdb_positives.csv')
 frames = [df1, df2]
 df3 = pd.concat(frames)
 
-HLA_list = list(set(df1['HLA'].unique()).union(df2['HLA'].unique()))
-HLA_list = [hla.replace('HLA-', '') for hla in HLA_list] # remove HLA- prefix to compare with fasta file
+# One dedupe pass over both columns; prefix strip by slice (the names only
+# ever carry HLA- at the front, so no second strip round is needed)
+hlas = pd.unique(pd.concat([df1['HLA'], df2['HLA']], ignore_index=True))
+HLA_list = [h[4:] if h.startswith('HLA-') else h for h in hlas]  # remove HLA- prefix to compare with fasta file
 
 with open('data/raw/HLA/hla_list.txt', 'w') as f:
     for hla in HLA_list:
         f.write(f"{hla}\n")
 
 # test for one HLA
-#HLA_list = ['HLA-A*01:01']
-HLA_list = [hla.replace('HLA-', '') for hla in HLA_list]  # Ensure no 'HLA-' prefix
+#HLA_list = ['A*01:01']
 
 filtered_records = []
 header = []
 sequence_list = []
+written_hlas = set()
+
 
-with open('data/raw/HLA/hla_prot.fasta', 'r') as fasta_file:
-    fasta_lines = fasta_file.readlines()
+def parse_fasta(path):
+    """Yield (header_line, sequence) one record at a time; never holds the file."""
+    with open(path, 'r') as fasta_file:
+        cur_header = None
+        cur_seq = []
+        for line in fasta_file:
+            if line.startswith('>'):
+                if cur_header is not None:
+                    yield cur_header, ''.join(cur_seq)
+                cur_header = line
+                cur_seq = []
+            elif cur_header is not None:
+                cur_seq.append(line)
+        if cur_header is not None:
+            yield cur_header, ''.join(cur_seq)
+
+
+# Index the first hit per allele-name prefix (e.g. A*01:01:01:01 is reachable
+# as A*01, A*01:01, ...), so each HLA lookup is one dict get. Headers with
+# 'N ' (null alleles) are skipped, same as the old scan.
+first_hit = {}
+for header_line, seq in parse_fasta('data/raw/HLA/hla_prot.fasta'):
+    if 'N ' in header_line:
+        continue
+    fields = header_line.split()
+    if len(fields) < 2:
+        continue
+    parts = fields[1].split(':')
+    for k in range(1, len(parts) + 1):
+        first_hit.setdefault(':'.join(parts[:k]), seq)
 
 for hla in HLA_list:
-    found = False
-    record = ''
-    sequence = '' #needs to be empty for each HLA
-    for i, line in enumerate(fasta_lines):
-        if line.startswith('>') and 'N ' not in line:
-            if found:
-                break
-            if hla in line:
-                # Replace header with just the HLA tag
-                record = f'>{hla}\n'
-                # Collect the sequence lines
-                for seq_line in fasta_lines[i+1:]:
-                    if seq_line.startswith('>'):
-                        break
-                    record += seq_line
-                    sequence += seq_line
-                filtered_records.append(record)
-                header.append(f'HLA-{hla}')
-                sequence_list.append(sequence)
-                found = True
-    # Optionally, warn if not found
+    sequence = first_hit.get(hla)
+    if sequence is None:
+        continue
+    # Replace header with just the HLA tag
+    filtered_records.append(f'>{hla}\n{sequence}')
+    header.append(f'HLA-{hla}')
+    sequence_list.append(sequence)
+    written_hlas.add(hla)
 
 # Write filtered records to a new file
 with open('data/raw/HLA/hla_prot_filtered_firsthits.fasta', 'w') as out_file:
     out_file.writelines(filtered_records)
 
+# Indexed join: with HLA as the (deduplicated) index, pandas resolves each
+# row by direct hash lookup instead of building merge keys on both sides
 df_filtered = pd.DataFrame({'HLA': header, 'HLA_sequence': sequence_list})
-df_merge = df3.merge(df_filtered, on='HLA', how='left')
+df_filtered = df_filtered.drop_duplicates('HLA').set_index('HLA')
+df_merge = df3.join(df_filtered, on='HLA', how='left')
 #print(df_merge.head())
 df_merge.to_csv('data/raw/HLA/full_positives_hla_seq.csv', index=False)
 
-# Count headers in output file and compare with HLA list
-with open('data/raw/HLA/hla_prot_filtered_firsthits.fasta', 'r') as f:
-    header_count = sum(1 for line in f if line.startswith('>'))
+# written_hlas was tracked during the filter loop, so no re-read of the
+# output FASTA is needed to count or diff
 print(f"Number of HLAs in list: {len(HLA_list)}")
-print(f"Number of sequences written: {header_count}")
-
-# Find missing HLAs by comparing sets
-written_hlas = set()
-with open('data/raw/HLA/hla_prot_filtered_firsthits.fasta', 'r') as f:
-    for line in f:
-        if line.startswith('>'):
-            written_hlas.add(line[1:].strip())
+print(f"Number of sequences written: {len(written_hlas)}")
 
 missing_hlas = set(HLA_list) - written_hlas
 print("\nMissing HLAs:")